@@ -4,21 +4,68 @@
 import argparse
 import csv
 import datetime
+import itertools
+import json
+import math
 import os
 import paramiko
+import random
 import re
 import subprocess
 import sys
+import tempfile
+import threading
 import time
 
+try:
+	import yaml
+except ImportError:
+	yaml = None
+
+try:
+	from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+	from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+# Server configuration used unless a configuration grid overrides it
+DEFAULT_CONF = [
+	("shared_buffers", "8GB"),
+	("work_mem", "50MB"),
+	("maintenance_work_mem", "2GB"),
+	("max_wal_size", "16GB"),
+	# fsync is 'on'
+	("fsync", "off"),
+	# synchronous_commit is 'on'
+	("synchronous_commit", "off")]
+
+# Logging needed to put checkpoints and autovacuum runs on the timeline of
+# a point. '%n' is the epoch time, server and client clocks are assumed to
+# be synchronized.
+LOG_CONF = [
+	("log_line_prefix", "%n [%p] "),
+	("log_checkpoints", "on"),
+	("log_autovacuum_min_duration", "0")]
+
+# Comment of pgbench databases whose initialization completed
+INITIALIZED = "pgbench initialized"
+
 class Server(object):
-	def __init__(self, bin_path, host, user, password, port, with_rsocket):
+	def __init__(self, bin_path, host, user, password, port, with_rsocket,
+			keep_data=False):
 		self.bin_path = bin_path
 		self.host = host
 		self.user = user
 		self.password = password
 		self.port = port
 		self.with_rsocket = with_rsocket
+		self.keep_data = keep_data
+		self.conf = dict(DEFAULT_CONF)
+		# Caches are cold since the server was started
+		self.restarted = False
+
+	@property
+	def transport(self):
+		return "rsocket" if self.with_rsocket else "socket"
 
 	def init(self):
 		client = paramiko.SSHClient()
@@ -27,7 +74,16 @@ class Server(object):
 			password=self.password, port=self.port)
 		self.client = client
 
-		self.__exec_command("{0}/bin/initdb -D {0}/bench_data".format(self.bin_path))
+		# Reuse a data directory kept by a previous run together with its
+		# pgbench databases, only its configuration is written again
+		reuse = self.keep_data and self.__exec_command(
+			"test -f {0}/bench_data/PG_VERSION && echo yes || true".format(
+			self.bin_path)).strip() == "yes"
+		if reuse:
+			self.__exec_command("echo '# Written by bench_rsocket' > {0}/bench_data/postgresql.auto.conf".format(
+				self.bin_path))
+		else:
+			self.__exec_command("{0}/bin/initdb -D {0}/bench_data".format(self.bin_path))
 
 		# Set configuration
 		if self.with_rsocket:
@@ -37,60 +93,625 @@ class Server(object):
 			self.__append_conf("listen_addresses", self.host)
 
 		self.__append_conf("port", "5555")
-		self.__append_conf("shared_buffers", "8GB")
-		self.__append_conf("work_mem", "50MB")
-		self.__append_conf("maintenance_work_mem", "2GB")
-		self.__append_conf("max_wal_size", "16GB")
-
-		# fsync is 'on'
-		self.__append_conf("fsync", "off")
-		# synchronous_commit is 'on'
-		self.__append_conf("synchronous_commit", "off")
+		for name, value in DEFAULT_CONF + LOG_CONF:
+			self.__append_conf(name, value)
 
+		if reuse:
+			return
 		self.__exec_command("""echo "host    all     all   0.0.0.0/0   trust" >> {0}/bench_data/pg_hba.conf""".format(
 			self.bin_path))
 
 	def run(self):
 		self.__exec_command('{0}/bin/pg_ctl -w start -D {0}/bench_data -l {0}/bench_data/postgresql.log'.format(
 			self.bin_path))
-		self.__exec_command("{0}/bin/createdb pgbench -p 5555".format(self.bin_path))
+		self.restarted = True
 
 	def stop(self):
 		self.__exec_command('{0}/bin/pg_ctl -w stop -D {0}/bench_data'.format(self.bin_path))
-		self.__exec_command("rm -rf {0}/bench_data".format(self.bin_path))
+		if not self.keep_data:
+			self.__exec_command("rm -rf {0}/bench_data".format(self.bin_path))
 		self.client.close()
 
+	def create_database(self, name):
+		# Returns False if the database is already there and its pgbench
+		# initialization completed. A database left by a failed or
+		# interrupted initialization is dropped and created again.
+		state = self.psql(("SELECT coalesce(shobj_description(oid, 'pg_database'), '') "
+			"FROM pg_database WHERE datname = '{0}'").format(name))
+		if state == INITIALIZED:
+			return False
+		self.__exec_command("{0}/bin/dropdb --if-exists {1} -p 5555".format(self.bin_path, name))
+		self.__exec_command("{0}/bin/createdb {1} -p 5555".format(self.bin_path, name))
+		return True
+
+	def complete_database(self, name):
+		# Mark pgbench initialization of the database as completed
+		self.psql("COMMENT ON DATABASE {0} IS '{1}'".format(name, INITIALIZED))
+
+	def log_size(self):
+		return int(self.__exec_command("stat -c %s {0}/bench_data/postgresql.log".format(
+			self.bin_path)))
+
+	def read_log(self, offset):
+		# Server log written since offset
+		return self.__exec_command("tail -c +{0} {1}/bench_data/postgresql.log".format(
+			offset + 1, self.bin_path))
+
+	def database_size(self, name):
+		return int(self.psql("SELECT pg_database_size('{0}')".format(name)))
+
+	def memory(self):
+		# Size of shared_buffers and of server's RAM in bytes
+		shared_buffers = int(self.psql("SELECT pg_size_bytes(current_setting('shared_buffers'))"))
+		mem_total = int(self.__exec_command("awk '/^MemTotal:/ { print $2 }' /proc/meminfo")) * 1024
+		return shared_buffers, mem_total
+
+	def set_transport(self, with_rsocket):
+		# Switch listening addresses of the running server, the data
+		# directory is kept
+		if with_rsocket == self.with_rsocket:
+			return
+		self.with_rsocket = with_rsocket
+		if self.with_rsocket:
+			self.psql("ALTER SYSTEM SET listen_addresses = ''")
+			self.psql("ALTER SYSTEM SET listen_rdma_addresses = '{0}'".format(self.host))
+		else:
+			self.psql("ALTER SYSTEM SET listen_rdma_addresses = ''")
+			self.psql("ALTER SYSTEM SET listen_addresses = '{0}'".format(self.host))
+		self.restart()
+
+	def restart(self):
+		self.__exec_command('{0}/bin/pg_ctl -w restart -D {0}/bench_data -l {0}/bench_data/postgresql.log'.format(
+			self.bin_path))
+		self.restarted = True
+
+	def set_conf(self, settings):
+		# Apply settings on top of DEFAULT_CONF to the running server. The
+		# data directory is kept, the server is only restarted if a changed
+		# parameter can't be changed by reload.
+		conf = dict(DEFAULT_CONF)
+		conf.update(settings)
+
+		changed = []
+		for name in sorted(set(conf) | set(self.conf)):
+			if name not in conf:
+				self.psql("ALTER SYSTEM RESET {0}".format(name))
+			elif self.conf.get(name) != conf[name]:
+				self.psql("ALTER SYSTEM SET {0} = '{1}'".format(name, conf[name]))
+			else:
+				continue
+			changed.append(name)
+		self.conf = conf
+
+		if not changed:
+			return
+		restart = self.psql(("SELECT count(*) FROM pg_settings WHERE context = 'postmaster' "
+			"AND name IN ({0})").format(",".join("'{0}'".format(n) for n in changed)))
+		if int(restart) > 0:
+			self.restart()
+		else:
+			self.psql("SELECT pg_reload_conf()")
+
+	def settings(self):
+		# Effective values of all parameters which aren't left at default
+		out = self.psql("SELECT name, current_setting(name) FROM pg_settings "
+			"WHERE source NOT IN ('default', 'override') ORDER BY name")
+		return dict(line.split("|", 1) for line in out.splitlines() if line)
+
+	def psql(self, query):
+		return self.__exec_command('{0}/bin/psql -p 5555 -d postgres -AtX -c "{1}"'.format(
+			self.bin_path, query)).strip()
+
+	def output(self, cmd):
+		# Output of a command which is allowed to fail, e.g. a missing tool
+		return self.__exec_command("({0}) 2>/dev/null || true".format(cmd)).strip()
+
+	def start_command(self, cmd, env=None):
+		stdin, stdout, stderr = self.client.exec_command(cmd, environment=env)
+		return (cmd, stdout, stderr)
+
+	def wait_command(self, command):
+		cmd, stdout, stderr = command
+		out = stdout.read()
+		if stderr.channel.recv_exit_status() != 0:
+			print(stderr.read())
+			sys.exit("Command '{0}' failed with code: {1}".format(cmd,
+				stderr.channel.recv_exit_status()))
+		return out.decode("utf-8")
+
+	def start_memory_sampling(self, database, duration, interval):
+		# Sample memory of all postmaster's children until duration
+		# elapses, client backends are told apart by the database in their
+		# process title. VmRSS counts shared_buffers touched by every
+		# process, so private memory is RssAnon and VmPin and shared memory
+		# is counted once. Samples are summed up by awk on the server and
+		# only the one with the largest footprint of client backends is
+		# returned.
+		script = ("pm=$(head -n 1 {0}/bench_data/postmaster.pid)\n"
+			"end=$(($(date +%s%3N) + {1}))\n"
+			"i=0\n"
+			"while [ $(date +%s%3N) -lt $end ]; do\n"
+			"  for p in $(pgrep -P $pm); do\n"
+			"    kind=other\n"
+			"    grep -q ' {2} ' /proc/$p/cmdline 2>/dev/null && kind=backend\n"
+			"    [ -r /proc/$p/status ] && awk -v i=$i -v k=$kind "
+			"'/^(RssAnon|RssShmem|VmPin|VmLck):/ {{ v[$1] = $2 }} "
+			"END {{ print i, k, v[\"RssAnon:\"] + 0, v[\"VmPin:\"] + 0, v[\"VmLck:\"] + 0, "
+			"v[\"RssShmem:\"] + 0 }}' "
+			"/proc/$p/status 2>/dev/null\n"
+			"  done\n"
+			"  i=$((i + 1))\n"
+			"  sleep {3}\n"
+			"done | awk '{4}'\n").format(self.bin_path, int(duration * 1000), database,
+			interval, PEAK_MEMORY_AWK)
+		self.memory_sampling = self.start_command(script)
+
+	def fetch_memory_sampling(self):
+		# Sample with the largest footprint of client backends as a dict.
+		# Footprint of the server is private memory of all its processes
+		# and shared memory.
+		out = self.wait_command(self.memory_sampling)
+		self.memory_sampling = None
+		s = out.split()
+		if len(s) != 6:
+			return {}
+		memory = dict(zip(("backends", "backend_anon_kb", "backend_pin_kb", "backend_lck_kb",
+			"server_private_kb", "shared_kb"), [int(v) for v in s]))
+		memory["server_kb"] = memory.pop("server_private_kb") + memory["shared_kb"]
+		return memory
+
+	def start_wait_sampling(self, database, duration, frequency):
+		# Sample wait events of the benchmark's backends over a local
+		# connection until duration elapses. Every statement is run in its
+		# own transaction, so every sample sees a fresh pg_stat_activity
+		# snapshot. Samples are counted by awk on the server, so output
+		# stays small however long the point runs.
+		script = ("set -o pipefail\n"
+			"end=$(($(date +%s%3N) + {0}))\n"
+			"i=0\n"
+			"while [ $(date +%s%3N) -lt $end ]; do\n"
+			"  echo \"SELECT $i, coalesce(wait_event_type, 'CPU'), coalesce(wait_event, 'CPU') "
+			"FROM pg_stat_activity WHERE backend_type = 'client backend' "
+			"AND datname = '{1}' AND pid <> pg_backend_pid();\"\n"
+			"  i=$((i + 1))\n"
+			"  sleep {2}\n"
+			"done | {3}/bin/psql -p 5555 -d postgres -AtXq | "
+			"awk -F '|' 'NF == 3 {{ s[$1] = 1; w[$2 \"|\" $3]++ }} "
+			"END {{ n = 0; for (i in s) n++; print n; for (k in w) print k \"|\" w[k] }}'\n").format(
+			int(duration * 1000), database, 1.0 / frequency, self.bin_path)
+		self.wait_sampling = self.start_command(script)
+
+	def fetch_wait_sampling(self):
+		# Returns number of samples and counts of (wait_event_type, wait_event)
+		out = self.wait_command(self.wait_sampling)
+		self.wait_sampling = None
+		lines = out.splitlines()
+		if not lines:
+			return 0, {}
+		waits = {}
+		for line in lines[1:]:
+			s = line.strip().split("|")
+			if len(s) != 3:
+				continue
+			waits[(s[0], s[1])] = int(s[2])
+		return int(lines[0]), waits
+
+	def start_profile(self, mode, duration):
+		# Stacks are folded on the server, only "<stack> <count>" lines are
+		# transferred
+		if mode == "perf":
+			cmd = ("perf record -F 99 -g -a -o {0}/bench_profile.data -- sleep {1} > /dev/null 2>&1 && "
+				"perf script --comms postgres -i {0}/bench_profile.data | awk '{2}' && "
+				"rm -f {0}/bench_profile.data").format(self.bin_path, duration, FOLD_PERF_AWK)
+		else:
+			cmd = "offcputime-bpfcc -f {0}".format(duration)
+		self.profile = self.start_command(cmd)
+
+	def fetch_profile(self):
+		out = self.wait_command(self.profile)
+		self.profile = None
+		return parse_folded(out.splitlines())
+
 	def __exec_command(self, cmd):
 		stdin, stdout, stderr = self.client.exec_command(cmd)
+		out = stdout.read()
 		if stderr.channel.recv_exit_status() != 0:
 			print(stderr.read())
 			sys.exit("Command '{0}' failed with code: {1}".format(cmd,
 				stderr.channel.recv_exit_status()))
+		return out.decode("utf-8")
 
 	def __append_conf(self, name, value):
 		self.__exec_command("""echo "{0} = '{1}'" >> {2}/bench_data/postgresql.auto.conf""".format(
 			name, value, self.bin_path))
 
+# Sum up "<sample> <kind> <anon> <pin> <lck> <shmem>" lines of every process
+# by sample and print the sample with the largest anonymous and pinned
+# memory of client backends as "<backends> <anon> <pin> <lck>
+# <private of all processes> <shmem>". Every process maps the same shared
+# memory, the largest RssShmem of a process is taken as its size.
+PEAK_MEMORY_AWK = (
+	"function flush() { "
+	"if (n > 0 && (!seen || ba + bp > best)) { "
+	"seen = 1; best = ba + bp; peak = sprintf(\"%d %d %d %d %d %d\", b, ba, bp, bl, sp, sh) } "
+	"n = 0; b = 0; ba = 0; bp = 0; bl = 0; sp = 0; sh = 0 } "
+	"NF != 6 { next } "
+	"$1 != i { flush(); i = $1 } "
+	"{ n++; sp += $3 + $4; if ($6 > sh) sh = $6; "
+	"if ($2 == \"backend\") { b++; ba += $3; bp += $4; bl += $5 } } "
+	"END { flush(); if (seen) print peak }")
+
+# Fold samples of "perf script": a header line with the command name, frame
+# lines "<address> <symbol>+<offset> (<dso>)" and an empty line after every
+# sample. Frames are written root first, offsets and dsos are dropped.
+FOLD_PERF_AWK = (
+	"function flush(  s, i) { "
+	"if (comm != \"\") { s = comm; for (i = n; i >= 1; i--) s = s \";\" f[i]; c[s]++ } "
+	"comm = \"\"; n = 0 } "
+	"/^[ \\t]*$/ { flush(); next } "
+	"comm == \"\" { comm = $1; next } "
+	"{ sym = $0; sub(/^[ \\t]*[^ \\t]+[ \\t]*/, \"\", sym); sub(/ \\([^(]*\\)$/, \"\", sym); "
+	"gsub(/\\+0x[0-9a-f]+/, \"\", sym); gsub(/;/, \":\", sym); "
+	"if (sym == \"\") sym = \"[unknown]\"; f[++n] = sym } "
+	"END { flush(); for (s in c) print s, c[s] }")
+
+# Keep postgres stacks of folded output, values are samples of perf and us
+# of offcputime
+def parse_folded(lines):
+	stacks = {}
+	for line in lines:
+		s = line.rstrip().rsplit(" ", 1)
+		if len(s) != 2 or not s[0].startswith("postgres;"):
+			continue
+		stacks[s[0]] = stacks.get(s[0], 0) + int(s[1])
+	return stacks
+
+def write_folded(filename, stacks):
+	with open(filename, "w") as f:
+		for stack, count in sorted(stacks.items()):
+			f.write("{0} {1}\n".format(stack, count))
+
+# Read a configuration grid. A mapping of parameter names to lists of values
+# is expanded to all combinations, a list of mappings is used as is.
+def load_grid(filename):
+	with open(filename) as f:
+		if filename.endswith((".yaml", ".yml")):
+			if yaml is None:
+				sys.exit("PyYAML is required to read '{0}'".format(filename))
+			grid = yaml.safe_load(f)
+		else:
+			grid = json.load(f)
+
+	if isinstance(grid, dict):
+		names = sorted(grid)
+		values = [v if isinstance(v, list) else [v] for v in (grid[n] for n in names)]
+		grid = [dict(zip(names, p)) for p in itertools.product(*values)]
+	elif not isinstance(grid, list):
+		sys.exit("Configuration grid '{0}' must be a mapping or a list".format(filename))
+
+	confs = []
+	for conf in grid:
+		c = {}
+		for name, value in conf.items():
+			if isinstance(value, bool):
+				value = "on" if value else "off"
+			c[name] = str(value)
+		confs.append(c)
+	return confs
+
+# Interval report of "-P" as (elapsed, tps, latency, stddev). Intervals
+# without completed transactions report NaN latency, 0 TPS is returned for
+# them then.
+def parse_progress(line):
+	m = re.search("progress: ([\\d.]+) s, ([\\d.]+) tps, lat ([\\d.]+|-?nan) ms stddev ([\\d.]+|-?nan)",
+		line, re.IGNORECASE)
+	if m is None:
+		return None
+	latency = float(m.group(3).lstrip("-"))
+	tps = float(m.group(2)) if latency == latency else 0.0
+	return float(m.group(1)), tps, latency, float(m.group(4).lstrip("-"))
+
+# NaN and infinities aren't valid JSON, they are written as null
+def finite(value):
+	if math.isnan(value) or math.isinf(value):
+		return None
+	return value
+
+# Checkpoints and autovacuum runs of the server log as (time, event, detail)
+def parse_log_events(log):
+	events = []
+	for line in log.splitlines():
+		m = re.match("(\\d+\\.\\d+) \\[\\d+\\] LOG:\\s+(.*)$", line)
+		if m is None:
+			continue
+		t = float(m.group(1))
+		msg = m.group(2)
+		m = re.match("(checkpoint|restartpoint) (starting|complete): (.*)$", msg)
+		if m is not None:
+			events.append((t, "{0}_{1}".format(m.group(1), "start" if m.group(2) == "starting" else "complete"),
+				m.group(3)))
+			continue
+		m = re.match("automatic (vacuum|analyze) of table \"(.+?)\"", msg)
+		if m is not None:
+			events.append((t, "auto" + m.group(1), m.group(2)))
+	return events
+
+# VmRSS, VmPin and VmLck of a local process in kB
+def proc_memory(pid):
+	values = {}
+	try:
+		with open("/proc/{0}/status".format(pid)) as f:
+			for line in f:
+				s = line.split()
+				if s and s[0] in ("VmRSS:", "VmPin:", "VmLck:"):
+					values[s[0]] = int(s[1])
+	except IOError:
+		pass
+	return values.get("VmRSS:", 0), values.get("VmPin:", 0), values.get("VmLck:", 0)
+
+class MemorySampler(threading.Thread):
+	# Peak memory of local pgbench processes while a point is running
+	def __init__(self, interval):
+		threading.Thread.__init__(self)
+		self.daemon = True
+		self.interval = interval
+		self.stopped = threading.Event()
+		self.peak = {"pgbench_rss_kb": 0, "pgbench_pin_kb": 0, "pgbench_lck_kb": 0}
+		self.start()
+
+	def run(self):
+		while not self.stopped.wait(self.interval):
+			rss, pin, lck = 0, 0, 0
+			for pid in os.listdir("/proc"):
+				if not pid.isdigit():
+					continue
+				try:
+					with open("/proc/{0}/comm".format(pid)) as f:
+						if f.read().strip() != "pgbench":
+							continue
+				except IOError:
+					continue
+				r, p, l = proc_memory(pid)
+				rss, pin, lck = rss + r, pin + p, lck + l
+			if rss > self.peak["pgbench_rss_kb"]:
+				self.peak = {"pgbench_rss_kb": rss, "pgbench_pin_kb": pin,
+					"pgbench_lck_kb": lck}
+
+	def stop(self):
+		self.stopped.set()
+		self.join()
+		return self.peak
+
+# Two-sided 95% critical values of Student's t-distribution by degrees of
+# freedom, the normal value is used above 30
+T_95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+	2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+	2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+
+# Mean and half-width of its 95% confidence interval
+def mean_ci(values):
+	n = len(values)
+	mean = float(sum(values)) / n
+	if n < 2:
+		return mean, 0.0
+	stddev = math.sqrt(sum((v - mean) ** 2 for v in values) / (n - 1))
+	t = T_95[n - 2] if n - 1 <= len(T_95) else 1.96
+	return mean, t * stddev / math.sqrt(n)
+
+# Order of transports for every trial: the same order ("abab"), reversed
+# every other trial ("abba") or shuffled ("random")
+def trial_orders(transports, trials, order):
+	orders = []
+	for trial in range(trials):
+		o = list(transports)
+		if order == "abba" and trial % 2 == 1:
+			o.reverse()
+		elif order == "random":
+			random.shuffle(o)
+		orders.append(o)
+	return orders
+
+# Commands describing software and hardware of a host. {0} is the
+# PostgreSQL binaries path.
+FINGERPRINT = [
+	("kernel", "uname -r"),
+	("postgresql", "{0}/bin/pg_config --version"),
+	("rdma_core", "rpm -q rdma-core || dpkg-query -W -f '${{Version}}' rdma-core"),
+	("ofed", "ofed_info -s"),
+	("ucx", "ucx_info -v | head -n 1"),
+	("hca_firmware", "cat /sys/class/infiniband/*/fw_ver"),
+	("cpu", "grep -m 1 'model name' /proc/cpuinfo | cut -d: -f2")]
+
+def local_output(cmd):
+	# Output of a command which is allowed to fail, e.g. a missing tool
+	p = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE,
+		stderr=subprocess.PIPE, close_fds=True, universal_newlines=True)
+	out, err = p.communicate()
+	return out.strip()
+
+# rstream options for every transport. rstream uses rsockets unless
+# "-T s" asks for plain sockets.
+RSTREAM_OPTIONS = {
+	"socket": "-T s",
+	"rsocket": ""}
+
+# Result of a custom rstream test as (Gb/sec, usec/xfer). rstream names the
+# row "custom" when -S, -C or -I are given. usec/xfer of the ping-pong test
+# (-C 1) is the one-way latency.
+def parse_rstream(out):
+	for line in out.splitlines():
+		s = line.split()
+		if len(s) != 8:
+			continue
+		try:
+			return float(s[6]), float(s[7])
+		except ValueError:
+			# Header row
+			continue
+	return None
+
+# Environment of client programs for every transport. Variables set for
+# the benchmark itself, e.g. VMA ones, are kept.
+TRANSPORT_ENV = {
+	"socket": {},
+	"rsocket": {"WITH_RSOCKET": "true"}}
+
+def transport_env(transport):
+	p_env = os.environ.copy()
+	p_env.update(TRANSPORT_ENV[transport])
+	return p_env
+
+# Variables passed to programs started on the server for a transport
+def remote_env(transport):
+	p_env = dict((k, v) for k, v in os.environ.items()
+		if k.startswith("VMA_") or k == "LD_PRELOAD")
+	p_env.update(TRANSPORT_ENV[transport])
+	return p_env
+
 class Shell(object):
-	def __init__(self, cmd, with_rsocket, wait_time = 0):
+	def __init__(self, cmd, p_env, wait_time = 0, progress = None):
 		self.cmd = cmd
 		self.stdout = None
-		self.with_rsocket = with_rsocket
+		self.p_env = p_env
+		self.progress = progress
 		self.run()
 
 	def run(self):
-		p_env = os.environ.copy()
-		if self.with_rsocket:
-			p_env["WITH_RSOCKET"] = "true"
-		p = subprocess.Popen(self.cmd, shell=True,
-			stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True, env=p_env)
-		p.wait()
-		if p.returncode != 0:
-			out, err = p.communicate()
-			print(err)
-			sys.exit("Command '{0}' failed with code: {1}".format(
-				self.cmd, p.returncode))
-		self.stdout = "".join(p.stdout.readlines())
+		with tempfile.TemporaryFile(mode="w+") as out:
+			p = subprocess.Popen(self.cmd, shell=True,
+				stdout=out, stderr=subprocess.PIPE, close_fds=True, env=self.p_env,
+				universal_newlines=True)
+			# pgbench writes "-P" progress reports to stderr, so read them
+			# while the command is running
+			err = []
+			for line in iter(p.stderr.readline, ""):
+				err.append(line)
+				if self.progress is not None and line.startswith("progress:"):
+					self.progress(line)
+			p.wait()
+			if p.returncode != 0:
+				print("".join(err))
+				sys.exit("Command '{0}' failed with code: {1}".format(
+					self.cmd, p.returncode))
+			out.seek(0)
+			self.stdout = out.read()
+
+class MetricsHandler(BaseHTTPRequestHandler):
+	def do_GET(self):
+		if self.path not in ("/", "/metrics"):
+			self.send_error(404)
+			return
+		body = self.server.metrics.prometheus().encode("utf-8")
+		self.send_response(200)
+		self.send_header("Content-Type", "text/plain; version=0.0.4")
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, format, *args):
+		# Keep benchmark output clean
+		pass
+
+class Metrics(object):
+	def __init__(self, port=None, filename=None):
+		self.lock = threading.Lock()
+		self.transport = ""
+		self.clients = 0
+		self.rate = ""
+		self.point = 0
+		self.points = 0
+		self.elapsed = 0.0
+		self.tps = 0.0
+		self.latency = 0.0
+		self.stddev = 0.0
+		self.updated = 0.0
+
+		self.f = None
+		if filename is not None:
+			self.f = open(filename, "a")
+
+		self.httpd = None
+		if port is not None:
+			self.httpd = HTTPServer(("", port), MetricsHandler)
+			self.httpd.metrics = self
+			t = threading.Thread(target=self.httpd.serve_forever)
+			t.daemon = True
+			t.start()
+
+	def set_point(self, transport, clients, rate, point, points):
+		# Rate is the target TPS of an open-loop point, empty otherwise
+		with self.lock:
+			self.transport = transport
+			self.clients = clients
+			self.rate = rate
+			self.point = point
+			self.points = points
+			self.elapsed = 0.0
+			self.tps = 0.0
+			self.latency = 0.0
+			self.stddev = 0.0
+			self.updated = time.time()
+		self.__write("start")
+
+	def add_progress(self, line):
+		progress = parse_progress(line)
+		if progress is None:
+			return
+		with self.lock:
+			self.elapsed, self.tps, self.latency, self.stddev = progress
+			self.updated = time.time()
+		self.__write("progress")
+
+	def set_result(self, res):
+		with self.lock:
+			self.tps = res.tps
+			self.latency = res.avg_latency
+			self.updated = time.time()
+		self.__write("result")
+
+	def prometheus(self):
+		with self.lock:
+			labels = '{{transport="{0}",clients="{1}",rate="{2}"}}'.format(
+				self.transport, self.clients, self.rate)
+			values = [
+				("tps", "Transactions per second during the last progress interval",
+					self.tps),
+				("latency_ms", "Average latency during the last progress interval",
+					self.latency),
+				("latency_stddev_ms", "Latency standard deviation during the last progress interval",
+					self.stddev),
+				("elapsed_seconds", "Time elapsed since the current point was started",
+					self.elapsed),
+				("point", "Index of the current point in the sweep",
+					self.point),
+				("points", "Number of points in the sweep",
+					self.points),
+				("last_update_timestamp_seconds", "Time of the last progress report",
+					self.updated)]
+		lines = []
+		for name, help, value in values:
+			lines.append("# HELP bench_rsocket_{0} {1}".format(name, help))
+			lines.append("# TYPE bench_rsocket_{0} gauge".format(name))
+			lines.append("bench_rsocket_{0}{1} {2}".format(name, labels, value))
+		return "\n".join(lines) + "\n"
+
+	def close(self):
+		if self.httpd is not None:
+			self.httpd.shutdown()
+			self.httpd.server_close()
+		if self.f is not None:
+			self.f.close()
+
+	def __write(self, event):
+		if self.f is None:
+			return
+		with self.lock:
+			self.f.write(json.dumps({"event": event, "time": self.updated,
+				"transport": self.transport, "clients": self.clients,
+				"rate": self.rate, "point": self.point, "points": self.points,
+				"elapsed": self.elapsed, "tps": self.tps,
+				"latency": finite(self.latency), "stddev": finite(self.stddev)}) + "\n")
+			self.f.flush()
 
 class Result(object):
 	def __init__(self, out):
@@ -105,68 +726,357 @@ class Result(object):
 		except AttributeError:
 			sys.exit("Can't parse stdout:\n{0}".format(self.out))
 
+		# Reported for rate limited runs with "-R" and "--latency-limit" only
+		self.lag = ""
+		self.lag_max = ""
+		self.skipped = ""
+		self.late = ""
+		m = re.search('rate limit schedule lag: avg (\d+\.\d+) \(max (\d+\.\d+)\) ms', self.out)
+		if m is not None:
+			self.lag = float(m.group(1))
+			self.lag_max = float(m.group(2))
+		m = re.search('number of transactions skipped: \d+ \((\d+\.\d+) ?%\)', self.out)
+		if m is not None:
+			self.skipped = float(m.group(1)) / 100
+		m = re.search('number of transactions above the .+ latency limit: \d+/\d+ \((\d+\.\d+) ?%\)', self.out)
+		if m is not None:
+			self.late = float(m.group(1)) / 100
+
+		# Per-statement latencies reported by "-r". Newer pgbench versions
+		# add failures and retries columns after the latency.
+		self.statements = []
+		in_table = False
+		for line in self.out.splitlines():
+			if line.startswith("statement latencies in milliseconds"):
+				in_table = True
+				continue
+			if not in_table:
+				continue
+			m = re.match('\s*(\d+\.\d+)\s+(?:\d+\s+)*(\S.*)$', line)
+			if m is None:
+				break
+			self.statements.append((m.group(2).strip(), float(m.group(1))))
+
 class Writer(object):
-	def __init__(self, filename):
+	def __init__(self, filename, fieldnames):
 		self.f = open(filename, "wb")
-		fieldnames = ["clients", "tps", "trans", "avg_latency"]
 		self.writer = csv.DictWriter(self.f, fieldnames)
 		self.writer.writeheader()
 
-	def add_value(self, clients, tps, trans, avg_latency):
-		self.writer.writerow({"clients": clients, "tps": tps, "trans": trans,
-			"avg_latency": avg_latency})
+	def add_value(self, **values):
+		self.writer.writerow(values)
 
 	def close(self):
 		self.f.close()
 
 class Test(object):
-	def __init__(self, server, scale, clients, run_time, select_only):
+	def __init__(self, server, metrics, grid, args):
 		self.server = server
-		self.scale = scale
-		self.clients = clients
-		self.run_time = run_time
-		self.select_only = select_only
+		self.metrics = metrics
+		self.grid = grid
+		self.transports = args.transports
+		self.trials = args.trials
+		self.order = args.order
+		self.scales = args.scales
+		self.clients = args.clients
+		self.run_time = args.time
+		self.select_only = args.select_only
+		self.profile_at = args.profile_at
+		self.profile_mode = args.profile_mode
+		self.init_steps = args.init_steps
+		self.wait_frequency = args.wait_frequency
+		self.memory_interval = args.memory_interval
+		self.rates = args.rates
+		self.rate_clients = args.rate_clients or [args.clients]
+		self.latency_limit = args.latency_limit
+		self.preflight = args.preflight
+		self.warm_up = args.warm_up
+		self.options = dict((k, v) for k, v in vars(args).items() if k != "password")
 
 	def run(self):
-		select_only = "--select-only" if self.select_only else ""
+		date = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M")
+
+		self.writers = {}
+		self.statement_writers = {}
+		self.progress_writers = {}
+		self.event_writers = {}
+		self.wait_writers = {}
+		self.profile_dirs = {}
+		for transport in self.transports:
+			filename = "{0}_{1}_clients_{2}.csv".format(transport, self.clients, date)
 
-		filename = "{0}_{1}_clients_{2}.csv".format(
-			"rsocket" if self.server.with_rsocket else "socket",
-			self.clients, datetime.datetime.now().strftime("%Y-%m-%d_%H-%M"))
+			# Columns are only appended to keep graphic.py working
+			self.writers[transport] = Writer(filename, ["clients", "tps", "trans",
+				"avg_latency", "profile", "config", "settings", "scale", "db_size",
+				"shared_buffers", "mem_total", "trial", "client_wait", "backends",
+				"backend_anon_kb", "backend_pin_kb", "backend_lck_kb", "shared_kb", "server_kb",
+				"pgbench_rss_kb", "pgbench_pin_kb", "pgbench_lck_kb", "rate",
+				"lag", "lag_max", "skipped", "late"])
+			self.statement_writers[transport] = Writer(filename[:-len(".csv")] + "_statements.csv",
+				["scale", "config", "clients", "rate", "trial", "statement", "latency"])
+			self.progress_writers[transport] = Writer(filename[:-len(".csv")] + "_progress.csv",
+				["scale", "config", "clients", "rate", "trial", "time", "elapsed", "tps",
+				"latency", "stddev"])
+			self.event_writers[transport] = Writer(filename[:-len(".csv")] + "_events.csv",
+				["scale", "config", "clients", "rate", "trial", "time", "event", "detail"])
+			self.wait_writers[transport] = Writer(filename[:-len(".csv")] + "_waits.csv",
+				["scale", "config", "clients", "rate", "trial", "wait_event_type", "wait_event",
+				"samples", "fraction"])
+			self.profile_dirs[transport] = filename[:-len(".csv")] + "_profiles"
+			if self.profile_at:
+				os.mkdir(self.profile_dirs[transport])
+		summary_writer = Writer("summary_{0}_clients_{1}.csv".format(self.clients, date),
+			["transport", "scale", "config", "clients", "trials", "tps_mean", "tps_ci",
+			"avg_latency_mean", "avg_latency_ci", "rate"])
 
-		w = Writer(filename)
 		print("Initialize data directory...")
 		self.server.init()
+
+		print("Collect environment of client and server...")
+		with open("environment_{0}_clients_{1}.json".format(self.clients, date), "w") as f:
+			json.dump({
+				"date": date,
+				"options": self.options,
+				"server_host": self.server.host,
+				"client": dict((name, local_output(cmd.format(self.server.bin_path)))
+					for name, cmd in FINGERPRINT),
+				"server": dict((name, self.server.output(cmd.format(self.server.bin_path)))
+					for name, cmd in FINGERPRINT)}, f, indent=2, sort_keys=True)
+
+		if self.preflight:
+			self.run_preflight("preflight_{0}_clients_{1}.csv".format(self.clients, date))
+
 		print("Run database server...")
 		self.server.run()
 
-		print("Initialize pgbench database...")
-		Shell("{0}/bin/pgbench -h {1} -p 5555 -s {2} -i pgbench".format(
-			self.server.bin_path, self.server.host, self.scale),
-			self.server.with_rsocket)
+		# Closed-loop sweep of clients, or open-loop sweep of target rates
+		# at fixed numbers of clients
+		if self.rates:
+			points = [(c, r) for c in self.rate_clients for r in self.rates]
+		else:
+			points = [(1 if i == 0 else i, None) for i in range(0, self.clients + 1, 4)]
+		self.point = 0
+		self.points = len(self.scales) * len(self.grid) * len(points) * \
+			self.trials * len(self.transports)
 
-		for i in range(0, self.clients + 1, 4):
-			c = 1 if i == 0 else i
-			if i != 0:
-				print("\n")
-				# Wait 2 seconds
-				time.sleep(2)
+		for scale in self.scales:
+			database = "pgbench_{0}".format(scale)
+			if self.server.create_database(database):
+				print("Initialize pgbench database with scale {0}...".format(scale))
+				init_steps = "-I {0}".format(self.init_steps) if self.init_steps else ""
+				Shell("{0}/bin/pgbench -h {1} -p 5555 -s {2} -i {3} {4}".format(
+					self.server.bin_path, self.server.host, scale, init_steps, database),
+					transport_env(self.server.transport))
+				self.server.complete_database(database)
+			else:
+				print("Use cached pgbench database with scale {0}...".format(scale))
 
-			print("Run pgbench for {0} clients...".format(c))
+			for k, conf in enumerate(self.grid):
+				print("Apply server configuration {0}: {1}...".format(k, conf))
+				self.server.set_conf(conf)
+				dataset = {
+					"config": k,
+					"scale": scale,
+					"db_size": self.server.database_size(database)}
+				dataset["shared_buffers"], dataset["mem_total"] = self.server.memory()
+				print("Dataset size: {0} MB, shared_buffers: {1} MB, RAM: {2} MB".format(
+					dataset["db_size"] // 2**20, dataset["shared_buffers"] // 2**20,
+					dataset["mem_total"] // 2**20))
 
-			out = Shell("{0}/bin/pgbench -h {1} -p 5555 {2} -c {3} -j {3} -T {4} -v pgbench".format(
-				self.server.bin_path, self.server.host, select_only, c, self.run_time),
-				self.server.with_rsocket)
-			res = Result(out.stdout)
+				for c, rate in points:
+					results = dict((t, []) for t in self.transports)
+					orders = trial_orders(self.transports, self.trials, self.order)
+					for trial, order in enumerate(orders):
+						for transport in order:
+							if self.point != 0:
+								print("\n")
+								# Wait 2 seconds
+								time.sleep(2)
+							results[transport].append(self.run_point(database,
+								transport, c, rate, trial, dataset))
 
-			w.add_value(c, res.tps, res.trans, res.avg_latency)
-			print("Test result: tps={0} trans={1} avg_latency={2}".format(
-				res.tps, res.trans, res.avg_latency))
+					for transport in self.transports:
+						tps, tps_ci = mean_ci([r.tps for r in results[transport]])
+						lat, lat_ci = mean_ci([r.avg_latency for r in results[transport]])
+						summary_writer.add_value(transport=transport, scale=scale,
+							config=k, clients=c, trials=self.trials, tps_mean=tps,
+							tps_ci=tps_ci, avg_latency_mean=lat, avg_latency_ci=lat_ci,
+							rate=rate if rate is not None else "")
+						if self.trials > 1:
+							print("Summary for {0}: tps={1:.1f} +/- {2:.1f} avg_latency={3:.3f} +/- {4:.3f}".format(
+								transport, tps, tps_ci, lat, lat_ci))
 
-		print("Stop database server. Remove data directory...")
+		if self.server.keep_data:
+			print("Stop database server...")
+		else:
+			print("Stop database server. Remove data directory...")
 		self.server.stop()
+		for transport in self.transports:
+			self.writers[transport].close()
+			self.statement_writers[transport].close()
+			self.progress_writers[transport].close()
+			self.event_writers[transport].close()
+			self.wait_writers[transport].close()
+		summary_writer.close()
+
+	def run_preflight(self, filename):
+		# Raw round-trip latency and bandwidth of every transport between the
+		# same hosts, and the TPS one client can't exceed because of them
+		w = Writer(filename, ["transport", "latency_us", "rtt_us", "bandwidth_gbps",
+			"round_trips", "tps_limit_per_client"])
+		# Statements of the builtin scripts, each of them is a round trip
+		round_trips = 1 if self.select_only else 7
+
+		for transport in self.transports:
+			tests = {}
+			# Ping-pong of small messages and a stream of large ones
+			for test, sizes in (("lat", "-S 64 -C 1 -I 10000"), ("bw", "-S 65536 -C 10000")):
+				print("Run rstream {0} test over {1}...".format(test, transport))
+				options = "{0} {1} -p 7471".format(RSTREAM_OPTIONS[transport], sizes)
+				server = self.server.start_command("rstream {0}".format(options),
+					remote_env(transport))
+				# Let rstream server start listening
+				time.sleep(1)
+				out = Shell("rstream -s {0} {1}".format(self.server.host, options),
+					transport_env(transport))
+				self.server.wait_command(server)
+				tests[test] = parse_rstream(out.stdout)
+				if tests[test] is None:
+					sys.exit("No result of rstream {0} test over {1}".format(test, transport))
+
+			latency = tests["lat"][1]
+			w.add_value(transport=transport, latency_us=latency, rtt_us=2 * latency,
+				bandwidth_gbps=tests["bw"][0], round_trips=round_trips,
+				tps_limit_per_client=1e6 / (round_trips * 2 * latency))
+			print("Preflight result: latency={0}us bandwidth={1}Gb/s".format(
+				latency, tests["bw"][0]))
+
 		w.close()
 
+	def run_point(self, database, transport, c, rate, trial, dataset):
+		select_only = "--select-only" if self.select_only else ""
+		rate_limit = ""
+		if rate is not None:
+			rate_limit = "-R {0}".format(rate)
+			if self.latency_limit is not None:
+				rate_limit += " --latency-limit {0}".format(self.latency_limit)
+
+		if (transport == "rsocket") != self.server.with_rsocket:
+			print("Restart database server for {0}...".format(transport))
+			self.server.set_transport(transport == "rsocket")
+		if self.server.restarted and self.warm_up > 0:
+			# Don't measure the point against cold caches of the server
+			# started or restarted since the previous point
+			print("Warm up database server for {0} seconds...".format(self.warm_up))
+			Shell("{0}/bin/pgbench -h {1} -p 5555 {2} -c {3} -j {3} -T {4} {5}".format(
+				self.server.bin_path, self.server.host, select_only, c, self.warm_up,
+				database),
+				transport_env(transport))
+		self.server.restarted = False
+		# Settings as seen over the transport of the point
+		settings = json.dumps(self.server.settings(), sort_keys=True)
+
+		print("Run pgbench over {0} for {1} clients, trial {2}...".format(
+			transport, c, trial + 1))
+		self.point += 1
+		self.metrics.set_point(transport, c, rate if rate is not None else "",
+			self.point, self.points)
+
+		profile = c in self.profile_at
+		if profile:
+			print("Profile database server with {0}...".format(self.profile_mode))
+			self.server.start_profile(self.profile_mode, self.run_time)
+
+		point = {"scale": dataset["scale"], "config": dataset["config"],
+			"clients": c, "rate": rate if rate is not None else "", "trial": trial}
+
+		def progress(line):
+			self.metrics.add_progress(line)
+			p = parse_progress(line)
+			if p is not None:
+				self.progress_writers[transport].add_value(time=time.time(),
+					elapsed=p[0], tps=p[1], latency=p[2], stddev=p[3], **point)
+
+		if self.wait_frequency > 0:
+			self.server.start_wait_sampling(database, self.run_time, self.wait_frequency)
+		if self.memory_interval > 0:
+			self.server.start_memory_sampling(database, self.run_time, self.memory_interval)
+			sampler = MemorySampler(self.memory_interval)
+
+		log_offset = self.server.log_size()
+		out = Shell("{0}/bin/pgbench -h {1} -p 5555 {2} {3} -c {4} -j {4} -T {5} -P 1 -r -v {6}".format(
+			self.server.bin_path, self.server.host, select_only, rate_limit, c, self.run_time,
+			database),
+			transport_env(transport), progress=progress)
+		res = Result(out.stdout)
+
+		for t, event, detail in parse_log_events(self.server.read_log(log_offset)):
+			self.event_writers[transport].add_value(time=t, event=event,
+				detail=detail, **point)
+
+		# Share of backend time spent waiting for the client
+		client_wait = ""
+		if self.wait_frequency > 0:
+			samples, waits = self.server.fetch_wait_sampling()
+			total = sum(waits.values())
+			for (wait_type, wait_event), count in sorted(waits.items()):
+				self.wait_writers[transport].add_value(wait_event_type=wait_type,
+					wait_event=wait_event, samples=count,
+					fraction=float(count) / total, **point)
+			if total > 0:
+				client_wait = float(sum(count for (wait_type, wait_event), count in waits.items()
+					if wait_event in ("ClientRead", "ClientWrite"))) / total
+				print("Wait events: {0} samples, {1:.1%} of backend time in ClientRead/ClientWrite".format(
+					samples, client_wait))
+
+		# Peak memory footprint of backends and of pgbench
+		memory = {}
+		if self.memory_interval > 0:
+			memory = self.server.fetch_memory_sampling()
+			memory.update(sampler.stop())
+			if memory.get("backends"):
+				print("Memory: {0} backends, {1} kB anonymous and {2} kB pinned per backend, {3} kB shared, pgbench {4} kB RSS, {5} kB pinned".format(
+					memory["backends"], memory["backend_anon_kb"] // memory["backends"],
+					memory["backend_pin_kb"] // memory["backends"], memory["shared_kb"],
+					memory["pgbench_rss_kb"], memory["pgbench_pin_kb"]))
+
+		profile_file = ""
+		if profile:
+			profile_file = os.path.join(self.profile_dirs[transport], "{0}_{1}_{2}_{3}_{4}.folded".format(
+				dataset["scale"], dataset["config"], c, trial, self.profile_mode))
+			write_folded(profile_file, self.server.fetch_profile())
+
+		self.writers[transport].add_value(clients=c, tps=res.tps, trans=res.trans,
+			avg_latency=res.avg_latency, profile=profile_file, trial=trial,
+			client_wait=client_wait, rate=point["rate"], lag=res.lag, lag_max=res.lag_max,
+			skipped=res.skipped, late=res.late, settings=settings,
+			**dict(dataset, **memory))
+		for statement, latency in res.statements:
+			self.statement_writers[transport].add_value(statement=statement,
+				latency=latency, **point)
+		self.metrics.set_result(res)
+		print("Test result: tps={0} trans={1} avg_latency={2}".format(
+			res.tps, res.trans, res.avg_latency))
+		if rate is not None:
+			print("Rate limit result: target={0} lag={1} ms skipped={2} late={3}".format(
+				rate, res.lag, res.skipped, res.late))
+		return res
+
+def int_list(value):
+	try:
+		return [int(v) for v in value.split(",") if v]
+	except ValueError:
+		raise argparse.ArgumentTypeError("'{0}' is not a comma separated list of integers".format(value))
+
+def transport_list(value):
+	transports = [v for v in value.split(",") if v]
+	for t in transports:
+		if t not in ("rsocket", "socket"):
+			raise argparse.ArgumentTypeError("unknown transport '{0}'".format(t))
+	if not transports or len(set(transports)) != len(transports):
+		raise argparse.ArgumentTypeError("'{0}' is not a list of distinct transports".format(value))
+	return transports
+
 if __name__ == "__main__":
 	parser = argparse.ArgumentParser(description="rsocket benchmark tool",
 		add_help=False)
@@ -199,10 +1109,19 @@ if __name__ == "__main__":
 		default=22,
 		dest="port")
 	parser.add_argument("-s", "--scale",
-		type=int,
-		help="Scale of tables",
-		default=100,
-		dest="scale")
+		type=int_list,
+		help="Comma separated scales of tables",
+		default=[100],
+		dest="scales")
+	parser.add_argument("--init-steps",
+		type=str,
+		help="pgbench initialization steps, e.g. 'dtGvp' for server-side data generation",
+		dest="init_steps")
+	parser.add_argument("--keep-data",
+		help="Keep data directory and pgbench databases for later runs",
+		action="store_true",
+		default=False,
+		dest="keep_data")
 	parser.add_argument("-t", "--time",
 		type=int,
 		help="Time for tests",
@@ -213,22 +1132,96 @@ if __name__ == "__main__":
 		help="Maximum number of clients",
 		default=100,
 		dest="clients")
+	parser.add_argument("--transports",
+		type=transport_list,
+		help="Comma separated transports to compare",
+		default=["rsocket", "socket"],
+		dest="transports")
+	parser.add_argument("-n", "--trials",
+		type=int,
+		help="Number of trials of every point",
+		default=1,
+		dest="trials")
+	parser.add_argument("--order",
+		type=str,
+		help="Order of transports within trials",
+		default="abab",
+		choices=["abab", "abba", "random"],
+		dest="order")
+	parser.add_argument("-R", "--rates",
+		type=int_list,
+		help="Comma separated target rates in TPS, runs open-loop instead of sweeping clients",
+		default=[],
+		dest="rates")
+	parser.add_argument("--rate-clients",
+		type=int_list,
+		help="Comma separated numbers of clients for target rates (default: maximum number of clients)",
+		default=[],
+		dest="rate_clients")
+	parser.add_argument("-L", "--latency-limit",
+		type=float,
+		help="Count transactions above this latency in ms as late and skip too late ones",
+		dest="latency_limit")
 	parser.add_argument("-S", "--select-only",
 		help="Run select-only script",
 		action="store_true",
 		default=False,
 		dest="select_only")
+	parser.add_argument("--profile-at",
+		type=int_list,
+		help="Comma separated numbers of clients to profile database server at",
+		default=[],
+		dest="profile_at")
+	parser.add_argument("--profile-mode",
+		type=str,
+		help="Profile on-CPU time with perf or off-CPU time with bcc's offcputime",
+		default="perf",
+		choices=["perf", "offcpu"],
+		dest="profile_mode")
+	parser.add_argument("--preflight",
+		help="Measure raw latency and bandwidth of every transport with rstream first",
+		action="store_true",
+		default=False,
+		dest="preflight")
+	parser.add_argument("--wait-frequency",
+		type=float,
+		help="Frequency of pg_stat_activity wait event sampling in Hz, 0 disables it",
+		default=20,
+		dest="wait_frequency")
+	parser.add_argument("--memory-interval",
+		type=float,
+		help="Interval of backend and pgbench memory sampling in seconds, 0 disables it",
+		default=5,
+		dest="memory_interval")
+	parser.add_argument("--warm-up",
+		type=int,
+		help="Duration of unrecorded pgbench run before the first point after every start or restart of the server in seconds, 0 disables it",
+		default=10,
+		dest="warm_up")
+	parser.add_argument("--config-grid",
+		type=str,
+		help="JSON or YAML file with server configurations to sweep",
+		dest="config_grid")
+	parser.add_argument("--metrics-port",
+		type=int,
+		help="Serve live metrics in Prometheus text format on this port",
+		dest="metrics_port")
+	parser.add_argument("--metrics-file",
+		type=str,
+		help="Append live metrics as JSON lines to this file",
+		dest="metrics_file")
 
 	args = parser.parse_args()
 
-	# Run rsocket test
-	serv = Server(args.bin_path, args.host, args.user, args.password, args.port, True)
-	test = Test(serv, args.scale, args.clients, args.time, args.select_only)
-	test.run()
+	metrics = Metrics(args.metrics_port, args.metrics_file)
+	grid = load_grid(args.config_grid) if args.config_grid else [{}]
 
-	# Run socket test
-	serv = Server(args.bin_path, args.host, args.user, args.password, args.port, False)
-	test = Test(serv, args.scale, args.clients, args.time, args.select_only)
+	# Transports are interleaved at every point on the same server
+	serv = Server(args.bin_path, args.host, args.user, args.password, args.port,
+		args.transports[0] == "rsocket", args.keep_data)
+	test = Test(serv, metrics, grid, args)
 	test.run()
 
+	metrics.close()
+
 	print("Finished")
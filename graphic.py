@@ -2,46 +2,51 @@
 # encoding: utf-8
 
 import argparse
+import csv
 import matplotlib.pyplot as plt
 
-def read_csv(csv_file, mode):
-	x = []
-	y = []
-	i = 0
+def read_csv(csv_file, mode, scale, config):
+	values = {}
 
-	with open(csv_file, "rb") as f:
-		for row in f:
-			# Skip header row
-			if i == 0:
-				i += 1
-				continue
+	with open(csv_file) as f:
+		rows = list(csv.DictReader(f))
 
-			s = row.split(b",", 4)
+	# Results of older runs have neither scale nor config nor rate columns
+	if scale is None and rows and rows[0].get("scale"):
+		scale = min(int(row["scale"]) for row in rows)
 
-			# Clients
-			x.append(int(s[0]))
-			# TPS
-			if mode == "tps":
-				y.append(float(s[1]))
-			# Latency
-			else:
-				y.append(float(s[3]))
+	for row in rows:
+		if row.get("scale") and int(row["scale"]) != scale:
+			continue
+		if row.get("config") and int(row["config"]) != config:
+			continue
+		# Open-loop points aren't part of the sweep of clients
+		if row.get("rate"):
+			continue
 
-	return x, y
+		# Average trials of every number of clients
+		if mode == "tps":
+			value = float(row["tps"])
+		else:
+			value = float(row["avg_latency"])
+		values.setdefault(int(row["clients"]), []).append(value)
 
-def make_graphic(rsocket_csv, socket_csv, vma1_csv, vma2_csv, mode):
-	rsocket_x, rsocket_y = read_csv(rsocket_csv, mode)
-	socket_x, socket_y = read_csv(socket_csv, mode)
+	x = sorted(values)
+	return x, [sum(values[c]) / len(values[c]) for c in x]
+
+def make_graphic(rsocket_csv, socket_csv, vma1_csv, vma2_csv, mode, scale, config):
+	rsocket_x, rsocket_y = read_csv(rsocket_csv, mode, scale, config)
+	socket_x, socket_y = read_csv(socket_csv, mode, scale, config)
 
 	if (vma1_csv is not None):
-		vma1_x, vma1_y = read_csv(vma1_csv, mode)
+		vma1_x, vma1_y = read_csv(vma1_csv, mode, scale, config)
 	else:
-		vma1_x, vma1_y = None
+		vma1_x, vma1_y = None, None
 
 	if (vma2_csv is not None):
-		vma2_x, vma2_y = read_csv(vma2_csv, mode)
+		vma2_x, vma2_y = read_csv(vma2_csv, mode, scale, config)
 	else:
-		vma2_x, vma2_y = None
+		vma2_x, vma2_y = None, None
 
 	f, ax = plt.subplots()
 	ax.plot(rsocket_x, rsocket_y, color="black", marker="s", label="rsocket")
@@ -92,6 +97,17 @@ if __name__ == '__main__':
 		default="tps",
 		choices=['tps', 'latency'],
 		dest="mode")
+	parser.add_argument("--scale",
+		type=int,
+		help="Scale of tables to show, the smallest one by default",
+		required=False,
+		dest="scale")
+	parser.add_argument("--config",
+		type=int,
+		help="Index of server configuration to show",
+		default=0,
+		dest="config")
 
 	args = parser.parse_args()
-	make_graphic(args.rsocket_csv, args.socket_csv, args.vma1_csv, args.vma2_csv, args.mode)
+	make_graphic(args.rsocket_csv, args.socket_csv, args.vma1_csv, args.vma2_csv, args.mode,
+		args.scale, args.config)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import argparse
+import csv
+import os
+import matplotlib.pyplot as plt
+
+def read_csv(csv_file, scale, config):
+	points = {}
+
+	# Open-loop rows have a target rate, average their trials
+	with open(csv_file) as f:
+		for row in csv.DictReader(f):
+			if not row.get("rate"):
+				continue
+			if scale is not None and int(row["scale"]) != scale:
+				continue
+			if int(row["config"]) != config:
+				continue
+			key = (int(row["clients"]), int(row["rate"]))
+			points.setdefault(key, []).append((float(row["tps"]),
+				float(row["avg_latency"]), float(row["late"] or 0)))
+
+	curves = {}
+	for (clients, rate), values in sorted(points.items()):
+		n = len(values)
+		curves.setdefault(clients, []).append((sum(v[0] for v in values) / n,
+			sum(v[1] for v in values) / n, sum(v[2] for v in values) / n))
+	return curves
+
+def make_graphic(csv_files, scale, config):
+	colors = {"rsocket": "black", "socket": "red"}
+	markers = ["s", "o", "^", "v", "D"]
+
+	f, (ax_lat, ax_late) = plt.subplots(2, 1, sharex=True, figsize=(8, 8))
+	for csv_file in csv_files:
+		# Result files are named <transport>_<clients>_clients_<date>
+		transport = os.path.basename(csv_file).split("_", 1)[0]
+		color = colors.get(transport, "green")
+		for i, (clients, curve) in enumerate(sorted(read_csv(csv_file, scale, config).items())):
+			label = "{0}, {1} clients".format(transport, clients)
+			marker = markers[i % len(markers)]
+			ax_lat.plot([p[0] for p in curve], [p[1] for p in curve], color=color,
+				marker=marker, label=label)
+			ax_late.plot([p[0] for p in curve], [p[2] * 100 for p in curve], color=color,
+				marker=marker, label=label)
+
+	ax_lat.set_title("pgbench, latency against achieved throughput (-R)")
+	ax_lat.set_ylabel("Latency, ms")
+	ax_lat.set_ylim(ymin=0)
+	# Upper left corner
+	ax_lat.legend(loc=2)
+	ax_lat.grid(True)
+	ax_late.set_xlabel("TPS")
+	ax_late.set_ylabel("Late transactions, %")
+	ax_late.set_ylim(ymin=0)
+	ax_late.grid(True)
+
+	plt.savefig("bench_latency_rate.svg")
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description="Latency against throughput graphics creator")
+	parser.add_argument("csv_files",
+		type=str,
+		nargs="+",
+		help="Open-loop benchmark results, one file per transport")
+	parser.add_argument("--scale",
+		type=int,
+		help="Scale of tables to show",
+		required=False,
+		dest="scale")
+	parser.add_argument("--config",
+		type=int,
+		help="Index of server configuration to show",
+		default=0,
+		dest="config")
+
+	args = parser.parse_args()
+	make_graphic(args.csv_files, args.scale, args.config)
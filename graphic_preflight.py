@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import argparse
+import csv
+import os
+import matplotlib.pyplot as plt
+
+def read_preflight(csv_file):
+	limits = {}
+
+	with open(csv_file) as f:
+		for row in csv.DictReader(f):
+			limits[row["transport"]] = float(row["tps_limit_per_client"])
+
+	return limits
+
+def read_csv(csv_file, scale, config):
+	tps = {}
+
+	with open(csv_file) as f:
+		rows = list(csv.DictReader(f))
+
+	# Show the smallest scale unless one is given
+	if scale is None and rows:
+		scale = min(int(row["scale"]) for row in rows)
+
+	# Average trials of every number of clients
+	for row in rows:
+		if int(row["scale"]) != scale:
+			continue
+		if int(row["config"]) != config:
+			continue
+		# Open-loop points aren't part of the sweep of clients
+		if row["rate"]:
+			continue
+		tps.setdefault(int(row["clients"]), []).append(float(row["tps"]))
+
+	x = sorted(tps)
+	return x, [sum(tps[c]) / len(tps[c]) for c in x]
+
+def make_graphic(preflight_csv, csv_files, scale, config):
+	limits = read_preflight(preflight_csv)
+	colors = {"rsocket": "black", "socket": "red"}
+
+	f, ax = plt.subplots()
+	for csv_file in csv_files:
+		# Result files are named <transport>_<clients>_clients_<date>
+		transport = os.path.basename(csv_file).split("_", 1)[0]
+		color = colors.get(transport, "green")
+		x, y = read_csv(csv_file, scale, config)
+
+		ax.plot(x, y, color=color, marker="s", label=transport)
+		if transport in limits:
+			ax.plot(x, [c * limits[transport] for c in x], color=color,
+				linestyle="--", label="{0} round-trip limit".format(transport))
+
+	ax.set_ylim(ymin=0, ymax=max(max(read_csv(c, scale, config)[1]) for c in csv_files) * 1.5)
+	ax.set_title("pgbench TPS against round-trip limit")
+	ax.set_xlabel("Number of clients")
+	ax.set_ylabel("TPS")
+	# Upper left corner
+	ax.legend(loc=2)
+	ax.grid(True)
+
+	plt.savefig("bench_preflight.svg")
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description="Round-trip limit graphics creator")
+	parser.add_argument("-p", "--preflight-csv",
+		type=str,
+		help="Preflight result",
+		required=True,
+		dest="preflight_csv")
+	parser.add_argument("csv_files",
+		type=str,
+		nargs="+",
+		help="Benchmark results, one file per transport")
+	parser.add_argument("--scale",
+		type=int,
+		help="Scale of tables to show, the smallest one by default",
+		required=False,
+		dest="scale")
+	parser.add_argument("--config",
+		type=int,
+		help="Index of server configuration to show",
+		default=0,
+		dest="config")
+
+	args = parser.parse_args()
+	make_graphic(args.preflight_csv, args.csv_files, args.scale, args.config)
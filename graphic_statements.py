@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import argparse
+import csv
+import os
+import matplotlib.pyplot as plt
+
+def read_csv(csv_file, scale, config):
+	statements = []
+	latencies = {}
+
+	with open(csv_file) as f:
+		rows = list(csv.DictReader(f))
+
+	# Statements of different datasets don't add up, show the smallest
+	# scale unless one is given
+	if scale is None and rows:
+		scale = min(int(row["scale"]) for row in rows)
+
+	for row in rows:
+		if int(row["scale"]) != scale:
+			continue
+		if int(row["config"]) != config:
+			continue
+		# Open-loop points aren't part of the sweep of clients
+		if row["rate"]:
+			continue
+		# Meta commands are executed by pgbench itself
+		if row["statement"].startswith("\\"):
+			continue
+
+		if row["statement"] not in statements:
+			statements.append(row["statement"])
+		latencies.setdefault(int(row["clients"]), {}).setdefault(row["statement"], []).append(
+			float(row["latency"]))
+
+	# Average trials of every number of clients
+	x = sorted(latencies)
+	y = [[sum(latencies[c].get(s, [0.0])) / len(latencies[c].get(s, [0.0])) for c in x]
+		for s in statements]
+	return x, statements, y
+
+def make_graphic(csv_files, scale, config):
+	f, axes = plt.subplots(1, len(csv_files), sharey=True, squeeze=False,
+		figsize=(6 * len(csv_files), 6))
+
+	for ax, csv_file in zip(axes[0], csv_files):
+		x, statements, y = read_csv(csv_file, scale, config)
+
+		bottom = [0.0] * len(x)
+		for statement, latencies in zip(statements, y):
+			label = statement if len(statement) <= 40 else statement[:37] + "..."
+			ax.bar(x, latencies, width=2, bottom=bottom, label=label)
+			bottom = [b + l for b, l in zip(bottom, latencies)]
+
+		# Result files are named <transport>_<clients>_clients_<date>
+		ax.set_title(os.path.basename(csv_file).split("_", 1)[0])
+		ax.set_xlabel("Number of clients")
+		ax.grid(True)
+
+	axes[0][0].set_ylabel("Latency, ms")
+	axes[0][-1].legend(loc=2, fontsize="small")
+
+	plt.savefig("bench_statements.svg")
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description="Per-statement latency graphics creator")
+	parser.add_argument("csv_files",
+		type=str,
+		nargs="+",
+		help="Per-statement latencies, one *_statements.csv file per transport")
+	parser.add_argument("--scale",
+		type=int,
+		help="Scale of tables to show, the smallest one by default",
+		required=False,
+		dest="scale")
+	parser.add_argument("--config",
+		type=int,
+		help="Index of server configuration to show",
+		default=0,
+		dest="config")
+
+	args = parser.parse_args()
+	make_graphic(args.csv_files, args.scale, args.config)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import argparse
+import csv
+import sys
+import matplotlib.pyplot as plt
+
+def match(row, scale, config, clients, rate, trial):
+	return (scale is None or int(row["scale"]) == scale) and \
+		int(row["config"]) == config and int(row["clients"]) == clients and \
+		row["rate"] == (str(rate) if rate is not None else "") and \
+		int(row["trial"]) == trial
+
+def read_csv(stem, scale, config, clients, rate, trial):
+	progress = []
+	events = []
+
+	with open(stem + "_progress.csv") as f:
+		for row in csv.DictReader(f):
+			if match(row, scale, config, clients, rate, trial):
+				progress.append((float(row["time"]), float(row["elapsed"]),
+					float(row["tps"]), float(row["latency"])))
+
+	with open(stem + "_events.csv") as f:
+		for row in csv.DictReader(f):
+			if match(row, scale, config, clients, rate, trial):
+				events.append((float(row["time"]), row["event"]))
+
+	return progress, events
+
+def make_graphic(stem, scale, config, clients, rate, trial):
+	progress, events = read_csv(stem, scale, config, clients, rate, trial)
+	if not progress:
+		sys.exit("No progress reports for {0} clients in {1}_progress.csv".format(
+			clients, stem))
+
+	# Start of the point in epoch time
+	start = progress[0][0] - progress[0][1]
+	x = [p[0] - start for p in progress]
+
+	f, (ax_tps, ax_lat) = plt.subplots(2, 1, sharex=True, figsize=(10, 7))
+	ax_tps.plot(x, [p[2] for p in progress], color="black")
+	ax_lat.plot(x, [p[3] for p in progress], color="black")
+
+	checkpoint = None
+	for t, event in events:
+		t -= start
+		if event.endswith("_start"):
+			checkpoint = t
+		elif event.endswith("_complete"):
+			for ax in (ax_tps, ax_lat):
+				ax.axvspan(checkpoint if checkpoint is not None else 0, t,
+					color="red", alpha=0.15)
+			checkpoint = None
+		else:
+			color = "green" if event == "autovacuum" else "blue"
+			for ax in (ax_tps, ax_lat):
+				ax.axvline(t, color=color, linestyle="--", linewidth=1)
+	# Checkpoint which didn't complete during the point
+	if checkpoint is not None:
+		for ax in (ax_tps, ax_lat):
+			ax.axvspan(checkpoint, x[-1], color="red", alpha=0.15)
+
+	ax_tps.set_title("{0}, {1} clients, trial {2} (red: checkpoint, green: autovacuum, blue: autoanalyze)".format(
+		stem, clients, trial), fontsize="small")
+	ax_tps.set_ylabel("TPS")
+	ax_tps.set_ylim(ymin=0)
+	ax_tps.grid(True)
+	ax_lat.set_ylabel("Latency, ms")
+	ax_lat.set_xlabel("Time, s")
+	ax_lat.set_ylim(ymin=0)
+	ax_lat.grid(True)
+
+	plt.savefig("bench_timeline.svg")
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description="Time-series graphics creator")
+	parser.add_argument("stem",
+		type=str,
+		help="Benchmark result file without '.csv', its _progress.csv and _events.csv files are read")
+	parser.add_argument("-c", "--clients",
+		type=int,
+		help="Number of clients of the point to show",
+		required=True,
+		dest="clients")
+	parser.add_argument("--scale",
+		type=int,
+		help="Scale of tables of the point to show",
+		required=False,
+		dest="scale")
+	parser.add_argument("--config",
+		type=int,
+		help="Index of server configuration of the point to show",
+		default=0,
+		dest="config")
+	parser.add_argument("-R", "--rate",
+		type=int,
+		help="Target rate of the open-loop point to show",
+		required=False,
+		dest="rate")
+	parser.add_argument("--trial",
+		type=int,
+		help="Trial of the point to show",
+		default=0,
+		dest="trial")
+
+	args = parser.parse_args()
+	make_graphic(args.stem, args.scale, args.config, args.clients, args.rate, args.trial)
@@ -0,0 +1,338 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+import argparse
+import csv
+import glob
+import io
+import json
+import os
+import sys
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+try:
+	from html import escape
+except ImportError:
+	from cgi import escape
+
+COLORS = {"rsocket": "black", "socket": "red"}
+
+FINGERPRINT_NAMES = [
+	("kernel", "Kernel"),
+	("postgresql", "PostgreSQL"),
+	("rdma_core", "rdma-core"),
+	("ofed", "OFED"),
+	("ucx", "UCX"),
+	("hca_firmware", "HCA firmware"),
+	("cpu", "CPU")]
+
+STYLE = """
+body { font-family: sans-serif; margin: 2em; }
+table { border-collapse: collapse; margin: 1em 0; }
+th, td { border: 1px solid #ccc; padding: 0.2em 0.6em; text-align: right; }
+th { background: #eee; }
+td.text { text-align: left; }
+.charts svg { width: 32%; height: auto; }
+"""
+
+def read_rows(csv_file):
+	with open(csv_file) as f:
+		return list(csv.DictReader(f))
+
+def read_run(run):
+	# Files of a run are named <kind>_<clients>_clients_<date>.csv
+	summary_csv = "summary_{0}.csv".format(run)
+	if not os.path.exists(summary_csv):
+		sys.exit("Summary '{0}' not found".format(summary_csv))
+
+	results = {}
+	for csv_file in sorted(glob.glob("*_{0}.csv".format(run))):
+		transport = csv_file[:-len("_{0}.csv".format(run))]
+		if transport not in ("summary", "preflight"):
+			results[transport] = read_rows(csv_file)
+
+	environment = None
+	if os.path.exists("environment_{0}.json".format(run)):
+		with open("environment_{0}.json".format(run)) as f:
+			environment = json.load(f)
+
+	preflight = None
+	if os.path.exists("preflight_{0}.csv".format(run)):
+		preflight = read_rows("preflight_{0}.csv".format(run))
+
+	return read_rows(summary_csv), results, environment, preflight
+
+def knee(x, y):
+	# Point of the rising part of the curve farthest above the line between
+	# its ends, like the "Kneedle" method does
+	peak = y.index(max(y))
+	if peak < 2:
+		return x[peak], y[peak]
+	dx = float(x[peak] - x[0])
+	dy = float(y[peak] - y[0]) or 1.0
+	i = max(range(peak + 1), key=lambda i: (y[i] - y[0]) / dy - (x[i] - x[0]) / dx)
+	return x[i], y[i]
+
+def svg(f):
+	buf = io.BytesIO()
+	f.savefig(buf, format="svg")
+	plt.close(f)
+	out = buf.getvalue().decode("utf-8")
+	# Drop XML prolog to inline the image
+	return out[out.index("<svg"):]
+
+def table(header, rows, text_columns=1):
+	out = ["<table><tr>"]
+	out.extend("<th>{0}</th>".format(escape(str(h))) for h in header)
+	out.append("</tr>")
+	for row in rows:
+		out.append("<tr>")
+		for i, value in enumerate(row):
+			cls = ' class="text"' if i < text_columns else ""
+			out.append("<td{0}>{1}</td>".format(cls, escape(str(value))))
+		out.append("</tr>")
+	out.append("</table>")
+	return "".join(out)
+
+def make_charts(points):
+	charts = []
+	for column, ylabel in (("tps", "TPS"), ("avg_latency", "Latency, ms")):
+		f, ax = plt.subplots()
+		for transport, rows in sorted(points.items()):
+			ax.errorbar([r["clients"] for r in rows], [r[column + "_mean"] for r in rows],
+				yerr=[r[column + "_ci"] for r in rows], color=COLORS.get(transport, "green"),
+				marker="s", capsize=3, label=transport)
+		ax.set_ylim(ymin=0)
+		ax.set_xlabel("Number of clients")
+		ax.set_ylabel(ylabel)
+		ax.legend(loc=4 if column == "tps" else 2)
+		ax.grid(True)
+		charts.append(svg(f))
+
+	# Speedup of every transport over plain sockets
+	if "socket" in points and len(points) > 1:
+		socket = dict((r["clients"], r["tps_mean"]) for r in points["socket"])
+		f, ax = plt.subplots()
+		for transport, rows in sorted(points.items()):
+			if transport == "socket":
+				continue
+			rows = [r for r in rows if socket.get(r["clients"])]
+			ax.plot([r["clients"] for r in rows],
+				[r["tps_mean"] / socket[r["clients"]] for r in rows],
+				color=COLORS.get(transport, "green"), marker="s", label=transport)
+		ax.axhline(1.0, color="red", linestyle="--")
+		ax.set_xlabel("Number of clients")
+		ax.set_ylabel("TPS speedup over socket")
+		ax.legend(loc=4)
+		ax.grid(True)
+		charts.append(svg(f))
+
+	return charts
+
+def memory_points(rows):
+	# Mean memory footprint over trials for every number of clients
+	points = {}
+	for r in rows:
+		if not r.get("backends") or r.get("rate"):
+			continue
+		points.setdefault(int(r["clients"]), []).append(r)
+
+	out = []
+	for c in sorted(points):
+		values = {}
+		for name in ("backends", "backend_anon_kb", "backend_pin_kb", "backend_lck_kb",
+				"shared_kb", "server_kb", "pgbench_rss_kb", "pgbench_pin_kb"):
+			values[name] = sum(float(r[name]) for r in points[c]) / len(points[c])
+		values["clients"] = c
+		out.append(values)
+	return out
+
+def make_memory_chart(memory):
+	f, ax = plt.subplots()
+	for transport, rows in sorted(memory.items()):
+		color = COLORS.get(transport, "green")
+		x = [r["clients"] for r in rows]
+		ax.plot(x, [(r["backend_anon_kb"] + r["backend_pin_kb"]) / r["backends"] / 1024 for r in rows],
+			color=color, marker="s", label="{0} private".format(transport))
+		ax.plot(x, [r["backend_pin_kb"] / r["backends"] / 1024 for r in rows],
+			color=color, marker="o", linestyle="--", label="{0} pinned".format(transport))
+	ax.set_ylim(ymin=0)
+	ax.set_xlabel("Number of clients")
+	ax.set_ylabel("Memory per backend, MB")
+	ax.legend(loc=2)
+	ax.grid(True)
+	return svg(f)
+
+def make_rate_chart(rate_points):
+	f, ax = plt.subplots()
+	for transport, rows in sorted(rate_points.items()):
+		for clients in sorted(set(r["clients"] for r in rows)):
+			curve = [r for r in rows if r["clients"] == clients]
+			ax.plot([r["tps_mean"] for r in curve], [r["avg_latency_mean"] for r in curve],
+				color=COLORS.get(transport, "green"), marker="s",
+				label="{0}, {1} clients".format(transport, clients))
+	ax.set_ylim(ymin=0)
+	ax.set_xlabel("TPS")
+	ax.set_ylabel("Latency, ms")
+	ax.legend(loc=2)
+	ax.grid(True)
+	return svg(f)
+
+def make_report(run):
+	summary, results, environment, preflight = read_run(run)
+
+	html = ["<!DOCTYPE html><html><head><meta charset=\"utf-8\">",
+		"<title>bench_rsocket {0}</title><style>{1}</style></head><body>".format(
+		escape(run), STYLE),
+		"<h1>bench_rsocket {0}</h1>".format(escape(run))]
+
+	if environment is not None:
+		html.append("<h2>Environment</h2>")
+		html.append(table(["", "Client", "Server ({0})".format(environment["server_host"])],
+			[(title, environment["client"].get(name, ""), environment["server"].get(name, ""))
+			for name, title in FINGERPRINT_NAMES], 3))
+		html.append(table(["Option", "Value"], sorted(
+			(k, json.dumps(v)) for k, v in environment["options"].items()), 2))
+
+	if preflight is not None:
+		html.append("<h2>Pre-flight</h2>")
+		html.append(table(["Transport", "Latency, us", "RTT, us", "Bandwidth, Gb/s",
+			"TPS limit per client"], [(r["transport"], r["latency_us"], r["rtt_us"],
+			r["bandwidth_gbps"], "{0:.0f}".format(float(r["tps_limit_per_client"])))
+			for r in preflight]))
+
+	groups = []
+	for row in summary:
+		key = (int(row["scale"]), int(row["config"]))
+		if key not in groups:
+			groups.append(key)
+
+	for scale, config in groups:
+		points = {}
+		rate_points = {}
+		for row in summary:
+			if (int(row["scale"]), int(row["config"])) != (scale, config):
+				continue
+			if row.get("rate"):
+				rate_points.setdefault(row["transport"], []).append({
+					"clients": int(row["clients"]),
+					"rate": int(row["rate"]),
+					"tps_mean": float(row["tps_mean"]),
+					"avg_latency_mean": float(row["avg_latency_mean"])})
+				continue
+			points.setdefault(row["transport"], []).append({
+				"clients": int(row["clients"]),
+				"trials": int(row["trials"]),
+				"tps_mean": float(row["tps_mean"]),
+				"tps_ci": float(row["tps_ci"]),
+				"avg_latency_mean": float(row["avg_latency_mean"]),
+				"avg_latency_ci": float(row["avg_latency_ci"])})
+
+		rows = [r for rs in results.values() for r in rs
+			if (int(r["scale"]), int(r["config"])) == (scale, config)]
+		html.append("<h2>Scale {0}, configuration {1}</h2>".format(scale, config))
+		if rows:
+			html.append("<p>Dataset {0} MB, shared_buffers {1} MB, server RAM {2} MB</p>".format(
+				int(rows[0]["db_size"]) // 2**20, int(rows[0]["shared_buffers"]) // 2**20,
+				int(rows[0]["mem_total"]) // 2**20))
+
+		if rate_points:
+			html.append("<h3>Latency against throughput</h3>")
+			html.append('<div class="charts">{0}</div>'.format(make_rate_chart(rate_points)))
+			html.append(table(["Transport", "Clients", "Target TPS", "TPS", "Latency, ms"],
+				[(transport, r["clients"], r["rate"], "{0:.0f}".format(r["tps_mean"]),
+				"{0:.3f}".format(r["avg_latency_mean"])) for transport, rs in sorted(rate_points.items())
+				for r in rs]))
+
+		if points:
+			peaks = []
+			for transport, rs in sorted(points.items()):
+				x = [r["clients"] for r in rs]
+				y = [r["tps_mean"] for r in rs]
+				peak = y.index(max(y))
+				knee_clients, knee_tps = knee(x, y)
+				peaks.append((transport, "{0:.0f}".format(y[peak]), x[peak],
+					"{0:.0f}".format(knee_tps), knee_clients,
+					"{0:.3f}".format(min(r["avg_latency_mean"] for r in rs))))
+			html.append(table(["Transport", "Peak TPS", "Clients at peak", "Knee TPS",
+				"Clients at knee", "Min latency, ms"], peaks))
+
+			html.append('<div class="charts">')
+			html.extend(make_charts(points))
+			html.append("</div>")
+
+			transports = sorted(points)
+			by_clients = {}
+			for transport in transports:
+				for r in points[transport]:
+					by_clients.setdefault(r["clients"], {})[transport] = r
+			header = ["Clients"]
+			for transport in transports:
+				header.extend(["{0} TPS".format(transport), "{0} latency, ms".format(transport)])
+			point_rows = []
+			for c in sorted(by_clients):
+				row = [c]
+				for transport in transports:
+					r = by_clients[c].get(transport)
+					if r is None:
+						row.extend(["", ""])
+					else:
+						row.append("{0:.0f} ± {1:.0f}".format(r["tps_mean"], r["tps_ci"]))
+						row.append("{0:.3f} ± {1:.3f}".format(r["avg_latency_mean"], r["avg_latency_ci"]))
+				point_rows.append(row)
+			html.append(table(header, point_rows))
+
+		memory = {}
+		for transport, rs in sorted(results.items()):
+			m = memory_points([r for r in rs
+				if (int(r["scale"]), int(r["config"])) == (scale, config)])
+			if m:
+				memory[transport] = m
+		if memory:
+			html.append("<h3>Memory footprint</h3>")
+			html.append('<div class="charts">{0}</div>'.format(make_memory_chart(memory)))
+			memory_rows = []
+			for transport, ms in sorted(memory.items()):
+				for m in ms:
+					# Private memory is anonymous and pinned one, shared
+					# memory is counted once for the whole server
+					private = m["backend_anon_kb"] + m["backend_pin_kb"]
+					memory_rows.append((transport, m["clients"], "{0:.0f}".format(m["backends"]),
+						"{0:.0f}".format(private / 1024),
+						"{0:.1f}".format(private / m["backends"] / 1024),
+						"{0:.1f}".format(m["backend_pin_kb"] / m["backends"] / 1024),
+						"{0:.1f}".format(m["backend_lck_kb"] / m["backends"] / 1024),
+						"{0:.0f}".format(m["shared_kb"] / 1024),
+						"{0:.0f}".format(m["server_kb"] / 1024),
+						"{0:.0f}".format(m["pgbench_rss_kb"] / 1024),
+						"{0:.0f}".format(m["pgbench_pin_kb"] / 1024)))
+			html.append(table(["Transport", "Clients", "Backends", "Backends private, MB",
+				"Private per backend, MB", "Pinned per backend, MB", "Locked per backend, MB",
+				"Shared, MB", "Server total, MB", "pgbench RSS, MB", "pgbench pinned, MB"],
+				memory_rows))
+
+		# Listening addresses differ between transports
+		for transport, rs in sorted(results.items()):
+			rs = [r for r in rs if (int(r["scale"]), int(r["config"])) == (scale, config)]
+			if rs:
+				html.append("<h3>Effective server configuration over {0}</h3>".format(transport))
+				settings = json.loads(rs[0]["settings"])
+				html.append(table(["Parameter", "Value"], sorted(settings.items()), 2))
+
+	html.append("</body></html>")
+
+	filename = "report_{0}.html".format(run)
+	with open(filename, "w") as f:
+		f.write("\n".join(html))
+	print("Report written to {0}".format(filename))
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description="HTML report creator")
+	parser.add_argument("run",
+		type=str,
+		help="Run to report, e.g. '100_clients_2020-01-01_12-00' for summary_100_clients_2020-01-01_12-00.csv")
+
+	args = parser.parse_args()
+	make_report(args.run)